@@ -1,11 +1,18 @@
+import asyncio
 import os
-import tempfile
+import orjson
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.responses import JSONResponse
 from speech_analyzer.analyzer import analyze_speech_return_dict
 
 app = FastAPI(title="Speech Analyzer API")
 
+class NumpyJSONResponse(JSONResponse):
+    """JSON response that serializes NumPy arrays and scalars natively via orjson."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
 @app.post("/analyze")
 async def analyze_audio(
     file: UploadFile = File(...),
@@ -13,7 +20,7 @@ async def analyze_audio(
 ):
     """
     Upload an audio file and get speech analysis.
-    
+
     - **file**: audio file to analyze (wav, mp3, etc.)
     - **segments**: number of segments to divide audio into for analysis
     """
@@ -21,26 +28,16 @@ async def analyze_audio(
     if file.content_type.split('/')[0] != "audio":
         raise HTTPException(status_code=400, detail="Upload an audio file")
 
-    # Save uploaded file to a temporary path
-    try:
-        suffix = os.path.splitext(file.filename)[1] or ".wav"
-        fd, temp_path = tempfile.mkstemp(suffix=suffix)
-        with os.fdopen(fd, "wb") as tmp:
-            content = await file.read()
-            tmp.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {e}")
-
-    # Run speech analysis
+    # The upload is already spooled by Starlette, so decode straight from its
+    # file object. Decoding, and any temp-file copy needed for the ffmpeg
+    # fallback, run off the event loop so other requests keep being served.
     try:
-        result = analyze_speech_return_dict(temp_path, segments=segments)
+        suffix = os.path.splitext(file.filename or "")[1] or ".wav"
+        await file.seek(0)
+        result = await asyncio.to_thread(
+            analyze_speech_return_dict, file.file, segments=segments, suffix=suffix
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-    finally:
-        # Clean up temp file
-        try:
-            os.remove(temp_path)
-        except Exception:
-            pass
 
-    return JSONResponse(content=result)
+    return NumpyJSONResponse(content=result)
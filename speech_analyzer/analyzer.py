@@ -1,153 +1,210 @@
+import os
+import shutil
+import tempfile
+
+import audioread
 import librosa
 import numpy as np
-from scipy.signal import resample
-import json
-
-def analyze_speech_return_dict(audio_path, segments=5):
-    y, sr = librosa.load(audio_path, sr=None)
+import soundfile as sf
+
+def _audioread_load(audio, suffix=None):
+    # audioread (ffmpeg) only reads from paths, so spool file-like input to a
+    # temporary file first, keeping the original extension as a format hint.
+    # Passing librosa.load an audioread object makes it skip its own soundfile
+    # attempt, which has already failed here.
+    temp_path = None
+    try:
+        if not isinstance(audio, (str, os.PathLike)):
+            fd, temp_path = tempfile.mkstemp(suffix=suffix)
+            with os.fdopen(fd, "wb") as tmp:
+                audio.seek(0)
+                shutil.copyfileobj(audio, tmp, 1 << 20)
+            audio = temp_path
+
+        with audioread.audio_open(audio) as aro:
+            return librosa.load(aro, sr=None, mono=True)
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+def _load_audio(audio, suffix=None):
+    # Read mono audio at its native rate with soundfile directly and only fall
+    # back to audioread/ffmpeg for formats libsndfile can't decode
+    try:
+        y, sr = sf.read(audio, dtype="float32", always_2d=False)
+    except sf.SoundFileRuntimeError:
+        return _audioread_load(audio, suffix=suffix)
+
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    return y, sr
+
+def analyze_speech_return_dict(audio, segments=5, suffix=None):
+    # suffix is the upload's file extension, used when ffmpeg has to decode it
+    y_native, native_sr = _load_audio(audio, suffix=suffix)
+    # Keep the whole pipeline in float32; nothing here needs double precision
+    y_native = np.ascontiguousarray(y_native, dtype=np.float32)
+
+    # Downsample anything above librosa's default rate for the pitch, pace and
+    # pause analyzers; lower-rate uploads are analysed at their native rate
+    if native_sr > 22050:
+        sr = 22050
+        y = librosa.resample(y_native, orig_sr=native_sr, target_sr=sr, res_type="soxr_hq")
+    else:
+        y, sr = y_native, native_sr
     audio_length = librosa.get_duration(y=y, sr=sr)
 
     num_parts = segments
     # Create time intervals to match number of segments
-    time_intervals = np.linspace(0, audio_length, num=num_parts).tolist()
+    time_intervals = np.linspace(0, audio_length, num=num_parts)
+
+    # Compute a single STFT shared by every per-segment analyzer; segments
+    # are then frame-index slices into this matrix.
+    n_fft = 2048
+    hop_length = 512
+    S = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length, dtype=np.complex64))
+
+    segment_length = len(y) // num_parts
+    frame_ranges = [
+        ((i * segment_length) // hop_length, ((i + 1) * segment_length) // hop_length)
+        for i in range(num_parts)
+    ]
 
     # ---------------- TONALITY ----------------
-    def analyze_tonality(y, sr, num_parts):
-        segment_length = len(y) // num_parts
+    def analyze_tonality(S, sr, frame_ranges):
+        # Track pitch over the whole signal once; segments slice the result
+        pitches_full, magnitudes_full = librosa.piptrack(S=S, sr=sr, n_fft=n_fft, hop_length=hop_length)
         tonality_scores = []
         
-        for i in range(num_parts):
-            segment_y = y[i * segment_length : (i + 1) * segment_length]
-            if len(segment_y) < sr * 0.5:  # Skip very short segments (<0.5s)
+        for f0, f1 in frame_ranges:
+            if segment_length < sr * 0.5:  # Skip very short segments (<0.5s)
                 tonality_scores.append(0.0)
                 continue
                 
-            pitches, magnitudes = librosa.piptrack(y=segment_y, sr=sr)
-            absolute_pitches = []
-            for t in range(pitches.shape[1]):
-                idx = magnitudes[:, t].argmax()
-                pitch = pitches[idx, t]
-                if 70 < pitch < 400:
-                    absolute_pitches.append(pitch)
+            pitches = pitches_full[:, f0:f1]
+            magnitudes = magnitudes_full[:, f0:f1]
+            # Take the strongest peak over all bins: frames whose strongest
+            # peak is a harmonic above 400 Hz are dropped by the band filter
+            # below, rather than replaced by a weaker in-band peak
+            idx = magnitudes.argmax(axis=0)
+            pitch = pitches[idx, np.arange(pitches.shape[1])]
+            absolute_pitches = pitch[(pitch > 70) & (pitch < 400)]
             
             if len(absolute_pitches) < 5:  # Lowered threshold for segments
                 tonality_scores.append(0.0)
                 continue
                 
-            pitches = np.array(absolute_pitches)
-            log_pitches = np.log2(pitches)
+            log_pitches = np.log2(absolute_pitches, dtype=np.float32)
             baseline = np.median(log_pitches)
             deviations = np.abs(log_pitches - baseline)
             variability = np.std(deviations)
             pitch_range = np.percentile(deviations, 90) - np.percentile(deviations, 10)
             tonality_energy = (variability * 0.6) + (pitch_range * 0.4)
-            score = np.clip(tonality_energy * 120, 0, 100)
-            tonality_scores.append(score)
+            tonality_scores.append(tonality_energy * 120)
         
-        return np.array(tonality_scores)
+        # Clamp every segment's score to 0-100 in one pass
+        return np.clip(tonality_scores, 0, 100)
 
 
     # ---------------- PACE ----------------
-    def analyze_pace(y, sr, num_parts):
-        segment_length = len(y) // num_parts
+    def analyze_pace(S, sr, frame_ranges):
+        # Same log-mel representation onset_strength builds from a waveform
+        mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S**2, sr=sr))
+        # Detect onsets over the whole signal once, then count them per segment
+        onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=hop_length)
+        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
+
+        duration_minutes = (segment_length / sr) / 60
         pace = []
 
-        for i in range(num_parts):
-            segment_y = y[i * segment_length:(i + 1) * segment_length]
-            if len(segment_y) == 0:
+        for f0, f1 in frame_ranges:
+            if f1 <= f0 or not duration_minutes:
                 pace.append(0)
                 continue
 
-            onset_env = librosa.onset.onset_strength(y=segment_y, sr=sr)
-            onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
-            onset_times = librosa.frames_to_time(onset_frames, sr=sr)
-
-            duration_minutes = (len(segment_y) / sr) / 60
-            words_per_minute = len(onset_times) / duration_minutes if duration_minutes else 0
-            pace.append(words_per_minute)
+            onset_count = np.count_nonzero((onset_frames >= f0) & (onset_frames < f1))
+            pace.append(onset_count / duration_minutes)
 
         return np.array(pace)
 
     # ---------------- PAUSING ----------------
-    def analyze_pauses(y, sr, num_parts):
-        segment_length = len(y) // num_parts
+    def analyze_pauses(S, sr, frame_ranges):
+        rms_full = librosa.feature.rms(S=S, frame_length=n_fft)[0]
+        dt = hop_length / sr  # seconds per frame
         pauses = []
 
-        for i in range(num_parts):
-            segment_y = y[i * segment_length:(i + 1) * segment_length]
-            if len(segment_y) == 0:
-                pauses.append(0)
-                continue
-
-            rms = librosa.feature.rms(y=segment_y)[0]
-            if len(rms) == 0:
+        for f0, f1 in frame_ranges:
+            if f1 <= f0:
                 pauses.append(0)
                 continue
 
+            rms = rms_full[f0:f1]
             threshold = np.mean(rms) * 0.5
             silent_regions = rms < threshold
-            times = librosa.times_like(rms)
-
-            pause_durations = []
-            current_pause = 0
 
-            for j, is_silent in enumerate(silent_regions):
-                dt = times[1] - times[0] if len(times) > 1 else 0.01
-                if is_silent:
-                    current_pause += dt
-                elif current_pause > 0:
-                    pause_durations.append(current_pause)
-                    current_pause = 0
+            # Run lengths of silence from the rising/falling edges of the mask
+            edges = np.diff(np.concatenate(([0], silent_regions.astype(np.int8), [0])))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
 
-            if current_pause > 0:
-                pause_durations.append(current_pause)
-
-            pauses.append(np.mean(pause_durations) if pause_durations else 0)
+            pauses.append((ends - starts).mean() * dt if len(starts) else 0)
 
         return np.array(pauses)
 
     # ---------------- VOCAL CHARACTERISTICS ----------------
-    def analyze_vocal_characters(y, sr):
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+    def analyze_vocal_characters(S, sr):
+        if native_sr != sr:
+            # The centroid limits below assume the full native band, so this
+            # one feature is computed on the original signal
+            spectral_centroid = librosa.feature.spectral_centroid(y=y_native, sr=native_sr)[0]
+        else:
+            spectral_centroid = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=n_fft)[0]
 
-        if len(spectral_centroid) == 0:
+        n_frames = len(spectral_centroid)
+        if n_frames == 0:
             spectral_centroid_resampled = np.zeros(num_parts)
+        elif n_frames < num_parts:
+            spectral_centroid_resampled = np.full(num_parts, np.mean(spectral_centroid))
         else:
-            spectral_centroid_resampled = resample(spectral_centroid, num_parts)
+            # Bin-average down to num_parts points instead of an FFT resample
+            usable = n_frames // num_parts * num_parts
+            spectral_centroid_resampled = np.mean(
+                spectral_centroid[:usable].reshape(num_parts, -1), axis=1
+            )
 
         mean_centroid = np.mean(spectral_centroid_resampled)
         min_centroid = 1000
         max_centroid = 4000
 
-        masculinity_percentage = max(
-            0, min(100, (max_centroid - mean_centroid) / (max_centroid - min_centroid) * 100)
-        )
+        pct = float((max_centroid - mean_centroid) / (max_centroid - min_centroid) * 100)
+        masculinity_percentage = 0.0 if pct < 0 else 100.0 if pct > 100 else pct
         femininity_percentage = 100 - masculinity_percentage
 
         return masculinity_percentage, femininity_percentage
 
     # ---------------- RUN ANALYSIS ----------------
-    tonality_var = analyze_tonality(y, sr, num_parts)
-    pace_var = analyze_pace(y, sr, num_parts)
-    pauses_var = analyze_pauses(y, sr, num_parts)
-    masculinity_percentage, femininity_percentage = analyze_vocal_characters(y, sr)
+    tonality_var = analyze_tonality(S, sr, frame_ranges)
+    pace_var = analyze_pace(S, sr, frame_ranges)
+    pauses_var = analyze_pauses(S, sr, frame_ranges)
+    masculinity_percentage, femininity_percentage = analyze_vocal_characters(S, sr)
 
     # ---------------- BUILD RESPONSE ----------------
+    # Values are left as NumPy arrays/scalars; the API serializes them with orjson
     response = {
         "tonality": {
             "time": time_intervals,
-            "data": tonality_var.tolist(),
-            "average": float(np.mean(tonality_var))
+            "data": tonality_var,
+            "average": np.mean(tonality_var)
         },
         "pace": {
             "time": time_intervals,
-            "data": pace_var.tolist(),
-            "average": float(np.mean(pace_var))
+            "data": pace_var,
+            "average": np.mean(pace_var)
         },
         "pausing": {
             "time": time_intervals,
-            "data": pauses_var.tolist(),
-            "average": float(np.mean(pauses_var))
+            "data": pauses_var,
+            "average": np.mean(pauses_var)
         },
         "vocalCharacters": {
             "masculinityPercentage": masculinity_percentage,